@@ -160,6 +160,14 @@ def main():
         help="number of workers")
     parser.add_argument(
         "--precision", default="amp", type=str)
+    parser.add_argument(
+        "--compile-transform", action="store_true",
+        help="Compile the batched BigEarthNet MS transform with torch.compile",
+    )
+    parser.add_argument(
+        "--bf16-transform", action="store_true",
+        help="Return bf16 images from the batched BigEarthNet MS transform and run the model under bf16 autocast",
+    )
     parser.add_argument(
         "--save-path", type=str, default="results/",
         help="Directory for saving checkpoints and results"
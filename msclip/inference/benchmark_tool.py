@@ -31,7 +31,8 @@ from msclip.inference.datasets.forestnet import init_forestnet
 from msclip.inference.datasets.bigearthnet import init_bigearthnet
 
 
-def zeroshot_get_dataset(dataset_name, root, other_features, templates, transform=None, all_bands=False):
+def zeroshot_get_dataset(dataset_name, root, other_features, templates, transform=None, all_bands=False,
+                         compile_transform=False, transform_dtype=torch.float32):
     untransformed_dataset = None
 
     if templates == "msclip":
@@ -160,7 +161,6 @@ def zeroshot_get_dataset(dataset_name, root, other_features, templates, transfor
         # std = (1399.638, 1223.713, 1205.586)
         bigearthnet_root = os.path.join(root, "BigEarthNet")
         dataset = init_bigearthnet(bigearthnet_root, [3, 2, 1], True, 19, mean, std, other_features, rgb=True)
-        setattr(dataset, "classes", dataset.class_sets[19])
         setattr(dataset, "templates", prompt_template)
 
     elif dataset_name == "BigEarthNet_MS":
@@ -171,10 +171,10 @@ def zeroshot_get_dataset(dataset_name, root, other_features, templates, transfor
             bands = [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11]  #
         else:
             bands = [1, 2, 3, 4, 5, 6, 7, 8, 10, 11]
-        dataset = init_bigearthnet(bigearthnet_root, bands, True, 19, mean, std, other_features)
+        dataset = init_bigearthnet(bigearthnet_root, bands, True, 19, mean, std, other_features,
+                                   compile_transform=compile_transform, transform_dtype=transform_dtype)
         untransformed_dataset = init_bigearthnet(bigearthnet_root, [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11], False, 19,
                                                  mean, std, other_features)
-        setattr(dataset, "classes", dataset.class_sets[19])
         setattr(dataset, "templates", prompt_template)
 
     elif dataset_name == "ForestNet_RGB":
@@ -197,8 +197,13 @@ def zeroshot_evaluation(model, zeroshot_dataset, preprocess, args):
     all_bands = hasattr(model, "channels") and model.channels == 12
     dataset, _ = zeroshot_get_dataset(dataset_name=zeroshot_dataset, root=args.dataset_dir,
                                       other_features=args.other_features, templates=args.templates,
-                                      transform=preprocess, all_bands=all_bands)
-    dataloader = torch.utils.data.DataLoader(dataset, batch_size=args.batch_size, num_workers=args.workers)
+                                      transform=preprocess, all_bands=all_bands,
+                                      compile_transform=getattr(args, "compile_transform", False),
+                                      transform_dtype=torch.bfloat16 if getattr(args, "bf16_transform", False)
+                                      else torch.float32)
+    dataloader = torch.utils.data.DataLoader(dataset, batch_size=args.batch_size, num_workers=args.workers,
+                                             worker_init_fn=getattr(dataset, "worker_init_fn", None),
+                                             pin_memory=str(args.device).startswith("cuda"))
     logging.info(f'Calculating classifier for {zeroshot_dataset}')
     classnames, prompt_templates = dataset.classes, dataset.templates
     one_class = not zeroshot_dataset in ["BigEarthNet", "BigEarthNetMS"]
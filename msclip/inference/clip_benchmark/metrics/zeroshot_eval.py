@@ -4,8 +4,10 @@
 # Thanks to the authors of OpenCLIP
 
 from contextlib import suppress
+import copy
 import torch
 import torch.nn.functional as F
+from torch.utils.data import Subset
 from tqdm import tqdm
 from torchmetrics import RetrievalMAP
 import numpy as np
@@ -105,19 +107,34 @@ def run_classification(model, classifier, dataloader, device, amp=True, one_clas
     true = []
     class_correct = defaultdict(int)  # ADDED 0 (default value provided by int())
     class_total = defaultdict(int)
+    # Dataset transforms that run batched on the device (e.g. BigEarthNet MS)
+    dataset = dataloader.dataset
+    while isinstance(dataset, Subset):
+        dataset = dataset.dataset
+    batch_transform = getattr(dataset, "batch_transform", None)
+    if batch_transform is not None:
+        # Move a copy, the dataset's own module stays on the CPU for the DataLoader workers
+        batch_transform = copy.deepcopy(batch_transform).to(device)
     with torch.no_grad():
         for images, target in tqdm(dataloader):
-            images = images.to(device)
+            images = images.to(device, non_blocking=True)
             target = target.to(device)
+            if batch_transform is not None:
+                images = batch_transform(images)
 
-            # predict
-            try:
-                image_features = model.encode_image(images)
-                if isinstance(image_features, tuple):
-                    image_features = image_features[0]
-            except AttributeError:
-                image_features = model.inference_vision(images)
-            image_features = F.normalize(image_features, dim=-1)
+            # predict, bf16 images (e.g. from a bf16 batch transform) run the model under autocast
+            if images.dtype == torch.bfloat16:
+                autocast = torch.autocast(device_type=torch.device(device).type, dtype=torch.bfloat16)
+            else:
+                autocast = suppress()
+            with autocast:
+                try:
+                    image_features = model.encode_image(images)
+                    if isinstance(image_features, tuple):
+                        image_features = image_features[0]
+                except AttributeError:
+                    image_features = model.inference_vision(images)
+            image_features = F.normalize(image_features.float(), dim=-1)
             logits = 100. * image_features @ classifier
 
             true.append(target.cpu())
@@ -5,22 +5,27 @@
 
 """BigEarthNet dataset."""
 
-import glob
+import contextlib
 import json
 import os
-from typing import Callable, Optional
+import pickle
+import shutil
+import warnings
+from typing import IO, Any, Callable, Optional
+from xml.sax.saxutils import escape
 
+import h5py
 import numpy as np
 import rasterio
 import torch
 
-from rasterio.enums import Resampling
-from torch import Tensor
+from rasterio.errors import NotGeoreferencedWarning
+from torch import Tensor, nn
 from torchvision import transforms
 from msclip.inference.datasets.geo import NonGeoDataset
 from msclip.inference.datasets.utils import download_url, extract_archive, sort_sentinel2_bands
-from msclip.inference.utils import Unsqueeze, SelectChannels, AddMeanChannels
-from msclip.inference.utils import SelectChannels, Unsqueeze, DictTransforms, ConvertType, AddMeanChannels
+from msclip.inference.utils import SelectChannels, AddMeanChannels
+from msclip.inference.utils import SelectChannels, DictTransforms, AddMeanChannels, FusedBENTransform
 
 
 class BigEarthNet(NonGeoDataset):
@@ -272,6 +277,14 @@ class BigEarthNet(NonGeoDataset):
     }
     image_size = (120, 120)
 
+    # GDAL configuration entered once per DataLoader worker, see worker_init_fn
+    gdal_options = {
+        "GDAL_CACHEMAX": 512,
+        "CPL_VSIL_CURL_ALLOWED_EXTENSIONS": ".tif",
+        "VSI_CACHE": True,
+        "GDAL_DISABLE_READDIR_ON_OPEN": "EMPTY_DIR",
+    }
+
     def __init__(
         self,
         root: str = "data",
@@ -282,6 +295,8 @@ class BigEarthNet(NonGeoDataset):
         download: bool = False,
         checksum: bool = False,
         other_features = False,
+        cache: bool = False,
+        batch_transform: Optional[nn.Module] = None,
     ) -> None:
         """Initialize a new BigEarthNet dataset instance.
 
@@ -294,6 +309,12 @@ class BigEarthNet(NonGeoDataset):
                 entry and returns a transformed version
             download: if True, download dataset and store it in the root directory
             checksum: if True, check the MD5 of the downloaded files (may be slow)
+            other_features: if True, add an "Other features" class to the target
+            cache: if True, store decoded images in a memory-mapped file in ``root``
+                so later epochs and instances skip decoding
+            batch_transform: a module applied by the evaluation loop to whole batches
+                once they are on the target device, e.g. :class:`FusedBENTransform`.
+                It is not applied by the dataset itself
         """
         assert split in self.splits_metadata
         assert bands in ["s1", "s2", "all"]
@@ -301,19 +322,42 @@ class BigEarthNet(NonGeoDataset):
         self.root = root
         self.split = split
         self.bands = bands
-        self.num_classes = num_classes   #remove if no ther class
+        self._num_bands = {"s1": 2, "s2": 12, "all": 14}[bands]
+        # Sentinel-2 reflectances are unsigned, Sentinel-1 backscatter is signed
+        self._dtype = np.uint16 if bands == "s2" else np.int16
+        self.other_features = other_features
+        self._classes = tuple(self.class_sets[num_classes]) + (
+            ("Other features",) if other_features else ()
+        )
+        self.num_classes = len(self._classes)
         self.transforms = transforms
+        self.batch_transform = batch_transform
         self.download = download
         self.checksum = checksum
         self.class2idx = {c: i for i, c in enumerate(self.class_sets[43])}
+        # class name -> 19 class index, -1 for classes without a 19 class counterpart
+        self._name_to_19 = {
+            c: self.label_converter.get(i, -1) for c, i in self.class2idx.items()
+        }
         self._verify()
         self.folders = self._load_folders()
-        self.other_features = other_features
-
-        if self.other_features and "Other features" not in self.class_sets[19]:
-            self.class_sets[19].append("Other features")
-            self.class_sets[43].append("Other features")
-            self.num_classes = self.num_classes + 1
+        self.cache = cache
+        self.cache_path = os.path.join(root, f"bigearthnet-{split}-{bands}.npy")
+        self._ready_path = os.path.join(root, f"bigearthnet-{split}-{bands}-ready.npy")
+        self._images: Optional["np.typing.NDArray[np.integer]"] = None
+        self._ready: Optional["np.typing.NDArray[np.uint8]"] = None
+        self._has_cache = self._check_cache()
+        if self.cache and not self._has_cache:
+            self._create_cache()
+            self._has_cache = True
+        self.hdf5_path = os.path.join(root, f"bigearthnet-{split}-{bands}.h5")
+        self._has_hdf5 = os.path.exists(self.hdf5_path)
+        self.stacked_dir = os.path.join(root, f"bigearthnet-{split}-{bands}-stacked")
+        self._has_stacked = os.path.isdir(self.stacked_dir)
+        self._h5: Optional[h5py.File] = None
+        self._h5_pid: Optional[int] = None
+
+        self._labels = self._load_labels()
 
     def __getitem__(self, index: int) -> dict[str, Tensor]:
         """Return an index within the dataset.
@@ -335,6 +379,15 @@ class BigEarthNet(NonGeoDataset):
 
         return sample["image"], sample["label"]
 
+    @property
+    def classes(self) -> list[str]:
+        """Class names of the target, in label order.
+
+        Returns:
+            the class names, including "Other features" if enabled
+        """
+        return list(self._classes)
+
     def __len__(self) -> int:
         """Return the number of data points in the dataset.
 
@@ -343,11 +396,16 @@ class BigEarthNet(NonGeoDataset):
         """
         return len(self.folders)
 
-    def _load_folders(self) -> list[dict[str, str]]:
+    def _load_folders(self) -> list[dict[str, Any]]:
         """Load folder paths.
 
+        The band and label file names of each folder are indexed once and cached
+        in ``root`` for later instances, keyed by folder name. The index holds no
+        paths, so it stays valid when the dataset is moved.
+
         Returns:
-            list of dicts of s1 and s2 folder paths
+            list of dicts of folder names, s1 and s2 folder paths, band file names
+            and label names
         """
         filename = self.splits_metadata[self.split]["filename"]
         dir_s1 = self.metadata["s1"]["directory"]
@@ -357,9 +415,6 @@ class BigEarthNet(NonGeoDataset):
             lines = f.read().strip().splitlines()
             pairs = [line.split(",") for line in lines]
 
-        
-        
-
         folders = [
             {
                 "s1": os.path.join(self.root, dir_s1, pair[0]),
@@ -367,8 +422,54 @@ class BigEarthNet(NonGeoDataset):
             }
             for pair in pairs
         ]
+
+        cache = os.path.join(
+            self.root, f"bigearthnet-{self.split}-{self.bands}-index.pkl"
+        )
+        index: Optional[list[dict[str, Any]]] = None
+        if os.path.exists(cache):
+            with open(cache, "rb") as f:
+                index = pickle.load(f)
+        names = [pair[0] for pair in pairs]
+        # Only valid for the same folders in the same order as the split file
+        if index is None or [entry.get("folder") for entry in index] != names:
+            keys = ["s1", "s2"] if self.bands == "all" else [self.bands]
+            index = []
+            for name, folder in zip(names, folders):
+                entry: dict[str, Any] = {"folder": name}
+                for key in keys:
+                    entry.update(self._scan_folder(folder[key], key))
+                index.append(entry)
+            self._save_to_root(cache, lambda f: pickle.dump(index, f))
+
+        for folder, entry in zip(folders, index):
+            folder.update(entry)
         return folders
 
+    def _scan_folder(self, directory: str, key: str) -> dict[str, Any]:
+        """Index the band and label files of a folder.
+
+        Args:
+            directory: folder to scan
+            key: one of {s1, s2}
+
+        Returns:
+            dict with the band file names in band order under ``{key}_files`` and
+            the label file name under ``{key}_label``
+        """
+        names = []
+        entry: dict[str, Any] = {}
+        with os.scandir(directory) as entries:
+            for dir_entry in entries:
+                if dir_entry.name.endswith(".tif"):
+                    names.append(dir_entry.name)
+                elif dir_entry.name.endswith(".json"):
+                    entry[f"{key}_label"] = dir_entry.name
+        entry[f"{key}_files"] = sorted(
+            names, key=sort_sentinel2_bands if key == "s2" else None
+        )
+        return entry
+
     def _load_paths(self, index: int) -> list[str]:
         """Load paths to band files.
 
@@ -378,24 +479,13 @@ class BigEarthNet(NonGeoDataset):
         Returns:
             list of file paths
         """
-        if self.bands == "all":
-            folder_s1 = self.folders[index]["s1"]
-            folder_s2 = self.folders[index]["s2"]
-            paths_s1 = glob.glob(os.path.join(folder_s1, "*.tif"))
-            paths_s2 = glob.glob(os.path.join(folder_s2, "*.tif"))
-            paths_s1 = sorted(paths_s1)
-            paths_s2 = sorted(paths_s2, key=sort_sentinel2_bands)
-            paths = paths_s1 + paths_s2
-        elif self.bands == "s1":
-            folder = self.folders[index]["s1"]
-            paths = glob.glob(os.path.join(folder, "*.tif"))
-            paths = sorted(paths)
-        else:
-            folder = self.folders[index]["s2"]
-            paths = glob.glob(os.path.join(folder, "*.tif"))
-            paths = sorted(paths, key=sort_sentinel2_bands)
-
-        return paths
+        folder = self.folders[index]
+        keys = ["s1", "s2"] if self.bands == "all" else [self.bands]
+        return [
+            os.path.join(folder[key], name)
+            for key in keys
+            for name in folder[f"{key}_files"]
+        ]
 
     def _load_image(self, index: int) -> Tensor:
         """Load a single image.
@@ -404,25 +494,353 @@ class BigEarthNet(NonGeoDataset):
             index: index to return
 
         Returns:
-            the raster image or target
+            the raster image as int16, casting to float is left to the transforms.
+            Sentinel-2-only images hold the uint16 reflectances reinterpreted as
+            int16 (torch cannot index uint16 tensors), so they stay at two bytes
+            per pixel until the transforms read them back as unsigned
         """
-        paths = self._load_paths(index)
-        images = []
-        for path in paths:
-            # Bands are of different spatial resolutions
-            # Resample to (120, 120)
-            with rasterio.open(path) as dataset:
-                array = dataset.read(
-                    indexes=1,
-                    out_shape=self.image_size,
-                    out_dtype="int32",
-                    resampling=Resampling.bilinear,
-                )
-                images.append(array)
-        arrays: "np.typing.NDArray[np.int_]" = np.stack(images, axis=0)
-        tensor = torch.from_numpy(arrays).float()
+        if self._has_hdf5:
+            arrays = self._empty_image()
+            self._get_h5()["images"].read_direct(arrays, np.s_[index])
+        elif self._has_cache:
+            images, ready = self._get_cache()
+            if ready[index]:
+                arrays = np.array(images[index])
+            else:
+                arrays = self._read_image(index)
+                if self.cache:
+                    # Flag the entry only once the image is fully written
+                    images[index] = arrays
+                    ready[index] = 1
+        else:
+            arrays = self._read_image(index)
+        tensor = torch.from_numpy(arrays.view(np.int16))
         return tensor
 
+    def _read_image(self, index: int) -> "np.typing.NDArray[np.integer]":
+        """Decode a single image.
+
+        Args:
+            index: index to return
+
+        Returns:
+            the raster image
+        """
+        if self._has_stacked:
+            # All bands are pixel-interleaved in one tile, a single read returns them
+            with rasterio.open(self._stacked_path(index)) as dataset:
+                return dataset.read(out=self._empty_image())
+        return self._read_bands(index)
+
+    def _read_bands(self, index: int) -> "np.typing.NDArray[np.integer]":
+        """Decode a single image from its band files.
+
+        Args:
+            index: index to return
+
+        Returns:
+            the raster image
+        """
+        paths = self._load_paths(index)
+        # Bands are of different spatial resolutions, the VRT stacks them and
+        # resamples to (120, 120) so all bands are decoded in a single read
+        with rasterio.Env(GDAL_NUM_THREADS="ALL_CPUS"), warnings.catch_warnings():
+            # The VRT only stacks pixels and carries no georeferencing
+            warnings.simplefilter("ignore", NotGeoreferencedWarning)
+            with rasterio.open(self._build_vrt(paths)) as dataset:
+                return dataset.read(out=self._empty_image())
+
+    def _empty_image(self) -> "np.typing.NDArray[np.integer]":
+        """Allocate the buffer a single image is decoded into.
+
+        Returns:
+            an uninitialized uint16 (S2) or int16 array of shape (bands, height, width)
+        """
+        return np.empty((self._num_bands, *self.image_size), dtype=self._dtype)
+
+    def _stacked_path(self, index: int, stacked_dir: Optional[str] = None) -> str:
+        """Get the path of the stacked GeoTIFF of a single image.
+
+        Args:
+            index: index to return
+            stacked_dir: directory of the stacked GeoTIFFs, defaults to :attr:`stacked_dir`
+
+        Returns:
+            path to the stacked GeoTIFF
+        """
+        name = os.path.basename(self.folders[index]["s2"])
+        return os.path.join(stacked_dir or self.stacked_dir, f"{name}.tif")
+
+    def _build_vrt(self, paths: list[str]) -> str:
+        """Build a VRT document stacking single band files.
+
+        Args:
+            paths: paths to the band files, in band order
+
+        Returns:
+            the VRT XML document
+        """
+        height, width = self.image_size
+        data_type = "UInt16" if self._dtype == np.uint16 else "Int16"
+        bands = []
+        for i, path in enumerate(paths, start=1):
+            # Without a SrcRect the whole source is read, whatever its size on disk
+            bands.append(
+                f'<VRTRasterBand dataType="{data_type}" band="{i}">'
+                '<SimpleSource resampling="bilinear">'
+                f'<SourceFilename relativeToVRT="0">{escape(path)}</SourceFilename>'
+                "<SourceBand>1</SourceBand>"
+                f'<DstRect xOff="0" yOff="0" xSize="{width}" ySize="{height}"/>'
+                "</SimpleSource>"
+                "</VRTRasterBand>"
+            )
+        return (
+            f'<VRTDataset rasterXSize="{width}" rasterYSize="{height}">'
+            + "".join(bands)
+            + "</VRTDataset>"
+        )
+
+    def prepare_cache(self) -> None:
+        """Decode all images not cached yet into the memory-mapped image cache.
+
+        Subsequent instances with the same split and bands load images from
+        :attr:`cache_path` instead of decoding the band files.
+        """
+        self.cache = True
+        if not self._has_cache:
+            self._create_cache()
+            self._has_cache = True
+        # Reopen writable in case the cache was opened read-only
+        self._images = self._ready = None
+        images, ready = self._get_cache()
+        for index in np.flatnonzero(ready == 0):
+            images[index] = self._read_image(index)
+            ready[index] = 1
+        images.flush()
+        ready.flush()
+
+    def _check_cache(self) -> bool:
+        """Check that the image cache exists and matches the split and bands.
+
+        Returns:
+            True if the cache and its ready flags can be used, False if they are
+            missing or were written for another split file or image dtype
+        """
+        try:
+            images = np.load(self.cache_path, mmap_mode="r")
+            ready = np.load(self._ready_path, mmap_mode="r")
+        except (OSError, ValueError):
+            return False
+        return (
+            images.shape == (len(self), self._num_bands, *self.image_size)
+            and images.dtype == self._dtype
+            and ready.shape == (len(self),)
+        )
+
+    def _create_cache(self) -> None:
+        """Create an empty image cache and its per-image ready flags.
+
+        Both files are written under temporary names and moved into place, so a
+        cache another process is filling is replaced, never truncated.
+        """
+        tmp_ready = f"{self._ready_path}.{os.getpid()}.tmp"
+        tmp_images = f"{self.cache_path}.{os.getpid()}.tmp"
+        ready = np.lib.format.open_memmap(
+            tmp_ready, mode="w+", dtype=np.uint8, shape=(len(self),)
+        )
+        ready.flush()
+        images = np.lib.format.open_memmap(
+            tmp_images,
+            mode="w+",
+            dtype=self._dtype,
+            shape=(len(self), self._num_bands, *self.image_size),
+        )
+        images.flush()
+        del ready, images
+        os.replace(tmp_ready, self._ready_path)
+        os.replace(tmp_images, self.cache_path)
+
+    def _get_cache(
+        self,
+    ) -> tuple["np.typing.NDArray[np.integer]", "np.typing.NDArray[np.uint8]"]:
+        """Return the memory-mapped image cache and its ready flags.
+
+        The files are mapped shared, so entries written by one DataLoader worker
+        are visible to the others.
+
+        Returns:
+            the cached images and the per-image ready flags
+        """
+        if self._images is None or self._ready is None:
+            mode = "r+" if self.cache else "r"
+            self._ready = np.load(self._ready_path, mmap_mode=mode)
+            self._images = np.load(self.cache_path, mmap_mode=mode)
+        return self._images, self._ready
+
+    def convert_to_hdf5(self) -> None:
+        """Decode all images and targets once and store them in a single HDF5 file.
+
+        Subsequent instances with the same split and bands read images and
+        targets from :attr:`hdf5_path` instead of the band and label files.
+        """
+        tmp_path = self.hdf5_path + ".tmp"
+        with h5py.File(tmp_path, "w", libver="latest") as f:
+            images = f.create_dataset(
+                "images",
+                shape=(len(self), self._num_bands, *self.image_size),
+                dtype=self._dtype,
+                chunks=(1, self._num_bands, *self.image_size),
+                compression="lzf",
+            )
+            for index in range(len(self)):
+                images[index] = self._read_image(index)
+            f.create_dataset("labels", data=self._labels.numpy().astype(np.uint8))
+        os.replace(tmp_path, self.hdf5_path)
+        self._has_hdf5 = True
+
+    def convert_to_stacked(self) -> None:
+        """Write every image as a single multi-band GeoTIFF.
+
+        Bands are resampled to :attr:`image_size` and pixel-interleaved in a single
+        tile, so subsequent instances with the same split and bands read an image
+        with one read from :attr:`stacked_dir` instead of one per band file.
+        """
+        height, width = self.image_size
+        tmp_dir = self.stacked_dir + ".tmp"
+        os.makedirs(tmp_dir, exist_ok=True)
+        for index in range(len(self)):
+            paths = self._load_paths(index)
+            # Georeference from a band at the target resolution
+            for path in paths:
+                with rasterio.open(path) as dataset:
+                    if dataset.shape == self.image_size:
+                        crs, transform = dataset.crs, dataset.transform
+                        break
+            else:
+                crs, transform = None, None
+            with rasterio.open(
+                self._stacked_path(index, tmp_dir),
+                "w",
+                driver="GTiff",
+                width=width,
+                height=height,
+                count=len(paths),
+                dtype=self._dtype,
+                crs=crs,
+                transform=transform,
+                interleave="pixel",
+                tiled=True,
+                blockxsize=128,
+                blockysize=128,
+            ) as dataset:
+                dataset.write(self._read_bands(index))
+        # Replace the output of an earlier conversion, os.replace needs an empty target
+        if os.path.isdir(self.stacked_dir):
+            shutil.rmtree(self.stacked_dir)
+        os.replace(tmp_dir, self.stacked_dir)
+        self._has_stacked = True
+
+    def _get_h5(self) -> h5py.File:
+        """Return the HDF5 file handle of the current process.
+
+        h5py handles are not fork-safe, so every DataLoader worker opens its own.
+
+        Returns:
+            the HDF5 file opened for reading
+        """
+        if self._h5 is None or self._h5_pid != os.getpid():
+            self._h5 = h5py.File(self.hdf5_path, "r", rdcc_nbytes=256 << 20, swmr=True)
+            self._h5_pid = os.getpid()
+        return self._h5
+
+    def __getstate__(self) -> dict[str, Any]:
+        """Drop open file handles when pickling, e.g. for spawned DataLoader workers.
+
+        Returns:
+            the instance state
+        """
+        state = self.__dict__.copy()
+        state["_h5"] = None
+        state["_images"] = state["_ready"] = None
+        return state
+
+    @classmethod
+    def worker_init_fn(cls, worker_id: int) -> None:
+        """Enter a persistent rasterio environment in a DataLoader worker.
+
+        Pass as ``worker_init_fn`` to :class:`torch.utils.data.DataLoader` so the
+        GDAL block cache and settings are shared by all reads of the worker.
+
+        Args:
+            worker_id: id of the DataLoader worker
+        """
+        env = rasterio.Env(**cls.gdal_options)
+        env.__enter__()
+        # Keep a reference on the worker's copy of the dataset for its lifetime
+        worker_info = torch.utils.data.get_worker_info()
+        if worker_info is not None:
+            worker_info.dataset._rasterio_env = env
+
+    def _load_labels(self) -> Tensor:
+        """Load the targets of all images.
+
+        Targets are read from :attr:`hdf5_path` if present, otherwise computed once
+        and cached in ``root`` for later instances when ``root`` is writable,
+        together with the folder names they belong to.
+
+        Returns:
+            the target labels, one row per image
+        """
+        if self._has_hdf5:
+            with h5py.File(self.hdf5_path, "r") as f:
+                if f["labels"].shape == (len(self), self.num_classes):
+                    return torch.from_numpy(f["labels"][:]).long()
+
+        filename = f"bigearthnet-{self.split}-labels_{self.num_classes}.pt"
+        path = os.path.join(self.root, filename)
+        names = self._folder_names()
+        if os.path.exists(path):
+            cached = torch.load(path)
+            # Only valid for the same folders in the same order as the split file
+            if isinstance(cached, dict) and cached.get("folders") == names:
+                return cached["labels"]
+
+        labels = torch.zeros(len(self), self.num_classes, dtype=torch.long)
+        for index in range(len(self)):
+            labels[index] = self._read_target(index)
+        self._save_to_root(
+            path, lambda f: torch.save({"folders": names, "labels": labels}, f)
+        )
+        return labels
+
+    def _folder_names(self) -> list[str]:
+        """Get the folder name of every image, in split file order.
+
+        Returns:
+            list of folder names
+        """
+        return [os.path.basename(folder["s2"]) for folder in self.folders]
+
+    def _save_to_root(self, path: str, save: Callable[[IO[bytes]], None]) -> None:
+        """Atomically write a cache file, skipping it if ``root`` is not writable.
+
+        The file is written under a temporary name and moved into place, so other
+        processes never see it half written.
+
+        Args:
+            path: destination of the file
+            save: function writing the file contents to an open binary file
+        """
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                save(f)
+            os.replace(tmp_path, path)
+        except OSError:
+            # e.g. a read-only dataset mount, continue without the cache
+            with contextlib.suppress(OSError):
+                os.remove(tmp_path)
+
     def _load_target(self, index: int) -> Tensor:
         """Load the target mask for a single image.
 
@@ -432,22 +850,27 @@ class BigEarthNet(NonGeoDataset):
         Returns:
             the target label
         """
-        if self.bands == "s2":
-            folder = self.folders[index]["s2"]
-        else:
-            folder = self.folders[index]["s1"]
+        return self._labels[index]
 
-        path = glob.glob(os.path.join(folder, "*.json"))[0]
-        with open(path) as f:
-            labels = json.load(f)["labels"]
+    def _read_target(self, index: int) -> Tensor:
+        """Read the target mask for a single image from its json file.
 
-        # labels -> indices
-        indices = [self.class2idx[label] for label in labels]
+        Args:
+            index: index to return
+
+        Returns:
+            the target label
+        """
+        key = "s2" if self.bands == "s2" else "s1"
+        folder = self.folders[index]
+        with open(os.path.join(folder[key], folder[f"{key}_label"])) as f:
+            labels = json.load(f)["labels"]
 
-        # Map 43 to 19/20 class labels
+        # labels -> indices, mapping 43 to 19/20 class labels
         if self.num_classes == 19 or self.num_classes == 20: #remove 20 if you have no other class
-            indices_optional = [self.label_converter.get(idx) for idx in indices]
-            indices = [idx for idx in indices_optional if idx is not None]
+            indices = [idx for idx in map(self._name_to_19.__getitem__, labels) if idx >= 0]
+        else:
+            indices = [self.class2idx[label] for label in labels]
 
         target = torch.zeros(self.num_classes, dtype=torch.long)
         target[indices] = 1
@@ -456,6 +879,22 @@ class BigEarthNet(NonGeoDataset):
     def _verify(self) -> None:
         """Verify the integrity of the dataset.
 
+        A sentinel file is written to ``root`` (if writable) once the dataset has been
+        verified, so later instances (e.g. in DataLoader workers) skip the checks.
+
+        Raises:
+            RuntimeError: if ``download=False`` but dataset is missing or checksum fails
+        """
+        sentinel = os.path.join(self.root, f".verified_{self.split}_{self.bands}")
+        if os.path.exists(sentinel):
+            return
+
+        self._verify_files()
+        self._save_to_root(sentinel, lambda f: None)
+
+    def _verify_files(self) -> None:
+        """Check that the dataset files exist, extracting or downloading them if needed.
+
         Raises:
             RuntimeError: if ``download=False`` but dataset is missing or checksum fails
         """
@@ -546,14 +985,22 @@ class BigEarthNet(NonGeoDataset):
         labels = []
         for i, mask in enumerate(label_mask):
             if mask:
-                labels.append(self.class_sets[self.num_classes][i])
+                labels.append(self._classes[i])
         return labels
 
 
-    
-def init_bigearthnet(path, bands, normalize, num_classes, means, stds, other_features, rgb = False, *args, **kwargs):
+
+
+def init_bigearthnet(path, bands, normalize, num_classes, means, stds, other_features, rgb = False,
+                     compile_transform=False, transform_dtype=torch.float32, *args, **kwargs):
     """
     Init BigEarthNet dataset, with S2 data and 43 classes as default.
+    For normalized MS data (rgb=False, normalize=True) the samples are the raw integer bands at 120x120:
+    channel selection, resizing and normalization are done by dataset.batch_transform, which
+    run_classification applies to whole batches on the device. Other consumers have to apply it themselves.
+    compile_transform compiles that batch transform with torch.compile and transform_dtype sets the dtype
+    of the images it returns (e.g. torch.bfloat16).
+    Unnormalized MS samples are float bands resized to 224 per sample.
     """
     # Get dataset parameters
     split = 'test'
@@ -567,14 +1014,12 @@ def init_bigearthnet(path, bands, normalize, num_classes, means, stds, other_fea
 
     # Init transforms
     if rgb:
+        # Lookup table scaling reflectances to uint8 (x / 2000 * 255), larger values clip to 255
+        lut = np.clip(np.arange(2 ** 15, dtype=np.float32) / 2000 * 255, 0, 255).astype(np.uint8)
         image_transforms = [
         SelectChannels(bands),
-        ConvertType(torch.float),
-        transforms.Lambda(lambda x: x.permute(1, 2, 0)),
-        transforms.Lambda(lambda x: x.numpy()),
-        transforms.Lambda(lambda x: x.astype(np.float32)  / 2000),
-        transforms.Lambda(lambda x: (x * 255).astype(np.uint8)),
-        
+        transforms.Lambda(lambda x: np.take(lut, x.permute(1, 2, 0).numpy().view(np.uint16), mode="clip")),
+
         transforms.ToTensor(),  #for rgb the values are scaled but not for ms
         transforms.Resize(
                 size=224,
@@ -583,19 +1028,20 @@ def init_bigearthnet(path, bands, normalize, num_classes, means, stds, other_fea
         transforms.CenterCrop(224),
         transforms.Normalize(mean= means, std = stds) 
         ]
+        ben_transforms = DictTransforms({'image': transforms.Compose(image_transforms)})
+        batch_transform = None
+    elif normalize:
+        # Resize and normalize whole batches on the device instead of per sample in the workers
+        ben_transforms = None
+        batch_transform = FusedBENTransform(
+            bands, mean=means, std=stds, dtype=transform_dtype, unsigned=satellite == "s2"
+        )
+        if compile_transform:
+            # Fuses channel selection, interpolation and normalization into few kernels
+            batch_transform = torch.compile(batch_transform, mode="reduce-overhead")
     else:
-        image_transforms = [
-        SelectChannels(bands),
-        ConvertType(torch.float),
-        transforms.Resize(size=224, antialias=True),
-    ]
-
-        if normalize:
-            # Normalize images
-            image_transforms.append(transforms.Normalize(mean=means, std=stds))
-            image_transforms.append(Unsqueeze(dim=1))  # add time dim
-
-    ben_transforms = DictTransforms({'image': transforms.Compose(image_transforms)})
+        ben_transforms = DictTransforms({'image': FusedBENTransform(bands, unsigned=satellite == "s2")})
+        batch_transform = None
 
     # Init dataset
     dataset = BigEarthNet(
@@ -604,7 +1050,8 @@ def init_bigearthnet(path, bands, normalize, num_classes, means, stds, other_fea
         bands=satellite,
         num_classes=num_classes,
         transforms=ben_transforms,
-        other_features=other_features
+        other_features=other_features,
+        batch_transform=batch_transform,
     )
 
     return dataset
\ No newline at end of file
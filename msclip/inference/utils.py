@@ -311,6 +311,40 @@ class ConvertType:
         return tensor.to(self.dtype)
 
 
+class FusedBENTransform(torch.nn.Module):
+    """
+    Select channels, cast to float, resize and normalize images in a single pass.
+    Accepts a single image (C, H, W) or a batch (B, C, H, W). Without mean/std the images are not normalized.
+    The output is cast to dtype (e.g. torch.bfloat16), resizing and normalization are computed in float32.
+    With unsigned=True, int16 inputs hold uint16 values (e.g. Sentinel-2 reflectances) and are read back as unsigned.
+    """
+
+    def __init__(self, channels, size=224, mean=None, std=None, dtype=torch.float32, unsigned=False):
+        super().__init__()
+        self.channels = list(channels)
+        self.size = size
+        self.dtype = dtype
+        self.unsigned = unsigned
+        self.register_buffer("mean", None if mean is None else torch.tensor(mean).view(1, -1, 1, 1))
+        self.register_buffer("std", None if std is None else torch.tensor(std).view(1, -1, 1, 1))
+
+    def forward(self, x):
+        unbatched = x.dim() == 3
+        if unbatched:
+            x = x.unsqueeze(0)
+        x = x[:, self.channels]
+        if self.unsigned:
+            x = x.to(torch.int32) & 0xFFFF
+        x = x.to(torch.float32)
+        x = torch.nn.functional.interpolate(x, size=(self.size, self.size), mode="bilinear", antialias=True)
+        if self.mean is not None:
+            x.sub_(self.mean).div_(self.std)
+        x = x.to(self.dtype)
+        if unbatched:
+            x = x.squeeze(0)
+        return x
+
+
 class AddMeanChannels:
     """
     Add missing channels to the tensor based on the mean values. Results in zeros after standardization.